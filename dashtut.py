@@ -1,59 +1,173 @@
-from dash import Dash, html, dcc, Input, Output, callback
+from dash import Dash, html, dcc, Input, Output, callback, ctx, Patch, no_update
+from flask_caching import Cache
 import plotly.graph_objects as go
 import calendar
 import plotly.express as px
 import pandas as pd
+import numpy as np
+import os
+
+# the flight csv is big and slow to parse, so after the first run it is loaded from a pickle instead
+CSV = 'airlinedelaycauses_DelayedFlights.csv'
+CACHE = 'airlinedelays.pkl'
+
+# only the columns the dashboard actually uses
+USECOLS = ['Month', 'DayOfWeek', 'DepTime', 'UniqueCarrier', 'FlightNum', 'AirTime', 'ArrDelay', 'DepDelay',
+           'Origin', 'Dest', 'Distance', 'Cancelled', 'Diverted', 'CarrierDelay', 'WeatherDelay', 'NASDelay',
+           'SecurityDelay', 'LateAircraftDelay']
+
+# smaller dtypes use less memory and make every groupby faster
+DTYPES = {
+    'UniqueCarrier': 'category', 'Origin': 'category', 'Dest': 'category',
+    'Month': 'int8', 'DayOfWeek': 'int8', 'Cancelled': 'int8', 'Diverted': 'int8',
+    'DepTime': 'float32', 'AirTime': 'float32', 'ArrDelay': 'float32', 'DepDelay': 'float32',
+    'CarrierDelay': 'float32', 'WeatherDelay': 'float32', 'NASDelay': 'float32',
+    'SecurityDelay': 'float32', 'LateAircraftDelay': 'float32'
+}
+
+# the cache can be used as long as it is not older than the csv, so a new csv is picked up automatically
+def cache_is_valid():
+    if not os.path.exists(CACHE):
+        return False
+    return not os.path.exists(CSV) or os.path.getmtime(CACHE) >= os.path.getmtime(CSV)
+
+def load_flights():
+    if cache_is_valid():
+        df = pd.read_pickle(CACHE)
+        # a cache made with other columns or dtypes than the ones above is made again
+        if set(df.columns) == set(USECOLS) and all(str(df[col].dtype) == dtype for col, dtype in DTYPES.items()):
+            return df
+
+    df = pd.read_csv(CSV, usecols=USECOLS, dtype=DTYPES)
+
+    # written to a temporary file first and then moved into place in one step, so another process
+    # (e.g. a second gunicorn worker) never reads a half-written cache
+    tmp_cache = f'{CACHE}.{os.getpid()}.tmp'
+    try:
+        df.to_pickle(tmp_cache)
+        os.replace(tmp_cache, CACHE)
+    finally:
+        # only still there if writing failed
+        if os.path.exists(tmp_cache):
+            os.remove(tmp_cache)
+    return df
 
 # Read flight data and airport coordinates
-df = pd.read_csv('airlinedelaycauses_DelayedFlights.csv')
+df = load_flights()
 airports_df = pd.read_csv('us-airports.csv')  
 
 # Take only the necessary columns out of this airports information dataframe
 airports_df = airports_df[['local_code', 'latitude_deg', 'longitude_deg','name','iata_code']]
 
+# all airport codes become one shared category type, so groupbys and merges between the flights and
+# the airports work on integer codes instead of strings.
+# this type holds every US airport, so groupbys on Origin, Dest or UniqueCarrier always use observed=True,
+# otherwise pandas makes an empty group for every unused code (and every combination of them)
+airport_codes = (df['Origin'].cat.categories
+                 .union(df['Dest'].cat.categories)
+                 .union(airports_df['local_code'].dropna().unique())
+                 .union(airports_df['iata_code'].dropna().unique()))
+airport_code_type = pd.CategoricalDtype(airport_codes)
+df = df.astype({'Origin': airport_code_type, 'Dest': airport_code_type})
+airports_df = airports_df.astype({'local_code': airport_code_type, 'iata_code': airport_code_type})
+
+# airport info indexed on airport code, the callbacks join on or look up in this index instead of merging
+# the whole airports dataframe each time
+AIRPORTS = airports_df.dropna(subset=['local_code']).drop_duplicates('local_code').set_index('local_code')
+LAT = AIRPORTS['latitude_deg']
+LON = AIRPORTS['longitude_deg']
+
 #taking a small 10% random sample to increase speed since it is a super large dataset
 sample10_df = df.sample(frac=0.1, random_state=11)
 
+# the sample sorted on origin (and destination), so the callbacks can look up an airport or route directly
+# instead of comparing every row
+by_origin = sample10_df.set_index('Origin').sort_index()
+by_od = sample10_df.set_index(['Origin', 'Dest']).sort_index()
 
-# creating the average arrival delays, grouping them on destination instead of origin
-# since arrival delays occur at the destination airport
-arrdelay_df = sample10_df.groupby('Dest').agg(
-    Avg_ArrDelay=('ArrDelay', 'mean')
-).reset_index() 
 
-# calculate averages based on origin, like departure delay, percentage cancelled, and average non-carrier delays
-avg_metrics = sample10_df.groupby('Origin').agg(
-    Avg_DepDelay=('DepDelay', 'mean'),
-    Pct_Cancelled=('Cancelled', lambda x: x.mean() * 100),
-    Avg_WeatherDelay=('WeatherDelay', 'mean'),
-    Avg_NASDelay = ('NASDelay', 'mean'),
-    Avg_SecurityDelay = ('SecurityDelay','mean'),
-    Avg_LateAircraft = ('LateAircraftDelay','mean')
-).reset_index()
+# Initialize the Dash app
+app = Dash(__name__)
 
-# adding all non-carrier delays together
-avg_metrics['Avg_NonCarrierDelay'] = avg_metrics[['Avg_WeatherDelay', 'Avg_NASDelay', 'Avg_SecurityDelay', 'Avg_LateAircraft']].sum(axis=1)
+# the flask server behind the app, for running it with gunicorn
+server = app.server
 
+# the callbacks only depend on their inputs, so their results are kept in memory and reused
+# when the same inputs are chosen again
+cache = Cache(app.server, config={'CACHE_TYPE': 'SimpleCache', 'CACHE_DEFAULT_TIMEOUT': 3600})
 
-# merging the arrival delay metric with the other calculated metrics
-metrics_df = pd.merge(arrdelay_df, avg_metrics, left_on='Dest', right_on='Origin', how='outer')
 
-# using origin column to merge the airport codes on
-metrics_df['airport_code'] = metrics_df['Origin'].fillna(metrics_df['Dest'])
+# the metrics on the first tab are averages per airport over the chosen months. Instead of grouping all flights
+# again every time the months change, the sums and counts are calculated once per month here, so the callback
+# only has to add up the chosen months
+ORIGIN_METRICS = ['DepDelay', 'Cancelled', 'WeatherDelay', 'NASDelay', 'SecurityDelay', 'LateAircraftDelay']
 
-# merging calculated metrics with the airport infor dataframe
-merged_df = pd.merge(metrics_df, airports_df, left_on='airport_code', right_on='local_code', how='left')
+# arrival delays are grouped on destination instead of origin, since arrival delays occur at the destination airport
+arrdelay_by_month = {int(month): group.groupby('Dest', observed=True)[['ArrDelay']].agg(['sum', 'count'])
+                     for month, group in sample10_df.groupby('Month')}
 
+# departure delay, cancellations and non-carrier delays are grouped on origin
+origin_by_month = {int(month): group.groupby('Origin', observed=True)[ORIGIN_METRICS].agg(['sum', 'count'])
+                   for month, group in sample10_df.groupby('Month')}
+
+
+# adds the sums and counts of the chosen months together and turns them into averages
+def combine_months(by_month, months):
+    frames = [by_month[month] for month in months if month in by_month]
+    if not frames:
+        # no months chosen, keep the columns but without any airports
+        frames = [next(iter(by_month.values())).iloc[:0]]
+
+    totals = pd.concat(frames).groupby(level=0, observed=True).sum()
+    return totals.xs('sum', axis=1, level=1) / totals.xs('count', axis=1, level=1)
+
+
+# calculates all metrics per airport for the chosen months and adds the airport info
+@cache.memoize()
+def compute_metrics(months):
+    arrdelay_df = combine_months(arrdelay_by_month, months).rename(columns={'ArrDelay': 'Avg_ArrDelay'}).reset_index()
+
+    avg_metrics = combine_months(origin_by_month, months).rename(columns={
+        'DepDelay': 'Avg_DepDelay',
+        'Cancelled': 'Pct_Cancelled',
+        'WeatherDelay': 'Avg_WeatherDelay',
+        'NASDelay': 'Avg_NASDelay',
+        'SecurityDelay': 'Avg_SecurityDelay',
+        'LateAircraftDelay': 'Avg_LateAircraft'
+    }).reset_index()
+
+    # cancelled as a percentage rather than a fraction
+    avg_metrics['Pct_Cancelled'] = avg_metrics['Pct_Cancelled'] * 100
+
+    # adding all non-carrier delays together
+    avg_metrics['Avg_NonCarrierDelay'] = avg_metrics[['Avg_WeatherDelay', 'Avg_NASDelay', 'Avg_SecurityDelay', 'Avg_LateAircraft']].sum(axis=1)
+
+    # merging the arrival delay metric with the other calculated metrics
+    metrics_df = pd.merge(arrdelay_df, avg_metrics, left_on='Dest', right_on='Origin', how='outer')
+
+    # using origin column to merge the airport codes on
+    metrics_df['airport_code'] = metrics_df['Origin'].fillna(metrics_df['Dest'])
+
+    # joining calculated metrics with the airport info
+    return metrics_df.join(AIRPORTS, on='airport_code', how='left')
+
+
+# origin airports for the dropdowns, made once and used by both tabs
+ORIGIN_OPTIONS = [{'label': origin, 'value': origin} for origin in sorted(sample10_df['Origin'].unique())]
+
+# destination options for every origin, so changing the origin in the dropdown is only a lookup
+iata_name = airports_df.dropna(subset=['iata_code']).drop_duplicates('iata_code').set_index('iata_code')['name'].to_dict()
+DEST_BY_ORIGIN = {origin: [{'label': f"{dest}: {iata_name[dest]}", 'value': dest}
+                           for dest in sorted(group['Dest'].unique()) if dest in iata_name]
+                  for origin, group in sample10_df.groupby('Origin', observed=True)}
 
-# Initialize the Dash app
-app = Dash(__name__)
 
 # Code for generating map on Avg Delays and Delay types tab
 def create_airport_map(data,top_airports):
     # scatter geo creates a map with points lat/long coordinates we get from the airports dataset
     fig = px.scatter_geo(data,
                          lat='latitude_deg', lon='longitude_deg',
-                         hover_name='Origin',
+                         hover_name='airport_code',
                          hover_data={'Avg_ArrDelay': True, 'Pct_Cancelled': True, 'Avg_NonCarrierDelay': True},
                          title="US Airports",
                          projection="albers usa")
@@ -64,7 +178,7 @@ def create_airport_map(data,top_airports):
         lon=top_airports['longitude_deg'],
         mode='markers',
         marker=dict(size=10, color='red'), 
-        text=top_airports['Origin'],
+        text=top_airports['airport_code'],
         name="Top 3 Airports"
     )
 
@@ -80,30 +194,55 @@ def create_airport_map(data,top_airports):
 
 
 
+# column and chart title for each metric that can be chosen with the radio buttons
+METRIC_CHARTS = {
+    'ArrDelay': ('Avg_ArrDelay', 'Average arrival delay per airport'),
+    'Cancelled': ('Pct_Cancelled', 'Percentage of cancelled flights'),
+    'NonCarrierDelay': ('Avg_NonCarrierDelay', 'Average non-carrier delays'),
+    'DepDelay': ('Avg_DepDelay', 'Average departure delay per airport')
+}
+
+# the 10 airports with the highest value for the chosen metric
+def top10_for_metric(data, metric):
+    column = METRIC_CHARTS[metric][0]
+
+    # sorting values descending, meaning you get the 10 highest on top 
+    return data.sort_values(column, ascending=False).head(10)
+
 # function for creating the bar chart on the first tab, shows whatever metric is selected in the topleft
 def create_metric_chart(data, metric):
 
-    if metric == 'ArrDelay':
-        # sorting values descending, meaning you get the 10 highest on top 
-        top10_avg = data.sort_values('Avg_ArrDelay', ascending=False).head(10)
-        fig = px.bar(top10_avg, x='airport_code', y='Avg_ArrDelay', title='Average arrival delay per airport')
+    if metric not in METRIC_CHARTS:
+        return px.bar(title="Select a metric to view data")
 
-    elif metric == 'Cancelled':
-        top10_cancelled = data.sort_values('Pct_Cancelled', ascending=False).head(10)
-        fig = px.bar(top10_cancelled, x='airport_code', y='Pct_Cancelled', title='Percentage of cancelled flights')
+    column, title = METRIC_CHARTS[metric]
+    return px.bar(top10_for_metric(data, metric), x='airport_code', y=column, title=title)
 
-    elif metric == 'NonCarrierDelay':
-        top10_noncarry = data.sort_values('Avg_NonCarrierDelay', ascending=False).head(10)
-        fig = px.bar(top10_noncarry, x='airport_code', y='Avg_NonCarrierDelay', title='Average non-carrier delays')
 
-    elif metric == 'DepDelay':
-        top10_dep = data.sort_values('Avg_DepDelay', ascending=False).head(10)
-        fig = px.bar(top10_dep, x='airport_code', y='Avg_DepDelay', title='Average departure delay per airport')
+# when only the metric changes, the map and bar chart keep the same structure. These patches only send
+# the changed values to the browser instead of the whole figures
 
-    else:
-        fig = px.bar(title="Select a metric to view data")
+# moves the red top 3 markers on the map
+def patch_airport_map(top_airports):
+    patch = Patch()
+    patch['data'][1]['lat'] = top_airports['latitude_deg'].tolist()
+    patch['data'][1]['lon'] = top_airports['longitude_deg'].tolist()
+    patch['data'][1]['text'] = top_airports['airport_code'].astype(str).tolist()
+    return patch
 
-    return fig
+# replaces the bars, hover text and titles of the bar chart. The values are taken from the full chart,
+# so the patched chart always looks the same as a newly made one
+def patch_metric_chart(data, metric):
+    fig = create_metric_chart(data, metric)
+    bars = fig.data[0]
+
+    patch = Patch()
+    patch['data'][0]['x'] = np.asarray(bars.x).tolist()
+    patch['data'][0]['y'] = np.asarray(bars.y).tolist()
+    patch['data'][0]['hovertemplate'] = bars.hovertemplate
+    patch['layout']['title']['text'] = fig.layout.title.text
+    patch['layout']['yaxis']['title']['text'] = fig.layout.yaxis.title.text
+    return patch
 
 
 
@@ -167,8 +306,7 @@ app.layout = html.Div([
                 html.Div([
                     dcc.Dropdown(
                         id='origin-airport',
-                        options=[{'label': origin, 'value': origin} 
-                                for origin in sorted(sample10_df['Origin'].unique())],
+                        options=ORIGIN_OPTIONS,
                         value='JFK',
                         placeholder="Select Origin Airport",
                         style={'width': '200px', 'margin': '10px'}
@@ -208,8 +346,7 @@ app.layout = html.Div([
                 html.Div([                
                     dcc.Dropdown(
                     id='Origin',
-                    options=[{'label': origin, 'value': origin} 
-                                for origin in sorted(sample10_df['Origin'].unique())],
+                    options=ORIGIN_OPTIONS,
                     value='JFK',
                     placeholder="Select Origin Airport",
                     style={'width': '200px', 'margin': '10px'}
@@ -257,57 +394,40 @@ app.layout = html.Div([
 # This is the code that updates both the map and the charts based on the chosen metric and chosen month(s)
 def update_map_and_chart(selected_metric, selected_months):
     
-    # filtering data based on selected months
+    # the per-month sums are added up for the selected months
+    # a sorted tuple so the same selection always gives the same cache key
     if 'All' in selected_months:
-        filtered_month_data = sample10_df
+        selected_months = tuple(range(1, 13))
     else:
-        filtered_month_data = sample10_df[sample10_df['Month'].isin(selected_months)]
+        selected_months = tuple(sorted(selected_months))
 
-    # have to recompute based on filtered data
-    metrics_df = filtered_month_data.groupby('Dest').agg(
-        Avg_ArrDelay=('ArrDelay', 'mean')
-    ).reset_index()
-    
-    # recalculating after filter
-    avg_metrics = filtered_month_data.groupby('Origin').agg(
-        Avg_DepDelay=('DepDelay', 'mean'),
-        Pct_Cancelled=('Cancelled', lambda x: x.mean() * 100),
-        Avg_WeatherDelay=('WeatherDelay', 'mean'),
-        Avg_NASDelay = ('NASDelay', 'mean'),
-        Avg_SecurityDelay = ('SecurityDelay','mean'),
-        Avg_LateAircraft = ('LateAircraftDelay','mean')
-    ).reset_index()
-
-    # adding all non-carrier delays together again
-    avg_metrics['Avg_NonCarrierDelay'] = avg_metrics[['Avg_WeatherDelay', 'Avg_NASDelay', 'Avg_SecurityDelay', 'Avg_LateAircraft']].sum(axis=1)
-    
-    # merging again
-    metrics_df = pd.merge(metrics_df, avg_metrics, left_on='Dest', right_on='Origin', how='outer')
-    metrics_df['airport_code'] = metrics_df['Origin'].fillna(metrics_df['Dest'])
-    merged_df = pd.merge(metrics_df, airports_df, left_on='airport_code', right_on='local_code', how='left')
+    merged_df = compute_metrics(selected_months)
 
 
     # find top 3 airports based on chosen metric
-    if selected_metric == 'ArrDelay':
-        top_airports = merged_df.nlargest(3, 'Avg_ArrDelay')
-    elif selected_metric == 'Cancelled':
-        top_airports = merged_df.nlargest(3, 'Pct_Cancelled')
-    elif selected_metric == 'NonCarrierDelay':
-        top_airports = merged_df.nlargest(3, 'Avg_NonCarrierDelay')
-    elif selected_metric == 'DepDelay':
-        top_airports = merged_df.nlargest(3, 'Avg_DepDelay')
+    top_airports = merged_df.nlargest(3, METRIC_CHARTS[selected_metric][0])
+
+    # only the metric changed, so the monthly chart stays the same and the other two are patched
+    if ctx.triggered_id == 'map-metric':
+        return patch_airport_map(top_airports), patch_metric_chart(merged_df, selected_metric), no_update
 
     # calling map and chart 
     map_figure = create_airport_map(merged_df, top_airports)
     chart_figure = create_metric_chart(merged_df, selected_metric)
 
     # line chart for the flights per month, for comparison
-    monthly_counts = sample10_df.groupby('Month').size()
-    line_chart = px.line(
+    monthly_counts = sample10_df['Month'].value_counts(sort=False).sort_index()
+    # line charts use the WebGL version of the scatter trace, which stays responsive with many points
+    line_chart = go.Figure(go.Scattergl(
         x=monthly_counts.index,
         y=monthly_counts.values,
-        labels={'x': 'Month', 'y': 'Flight Count'},
-        title='Monthly Flight Counts'
+        mode='lines'
+    ))
+
+    line_chart.update_layout(
+        title='Monthly Flight Counts',
+        xaxis_title='Month',
+        yaxis_title='Flight Count'
     )
 
     return map_figure, chart_figure, line_chart
@@ -325,42 +445,74 @@ def update_map_and_chart(selected_metric, selected_months):
 )
 
 
+@cache.memoize()
 def origin_airport_analysis(origin_airport, metric):
    
    # filter based on chosen airport
     if origin_airport: # check if origin airport is empty or not
-        df_routes = sample10_df[sample10_df['Origin'] == origin_airport]
+        # a list as key always gives a dataframe, also for an airport with only one flight
+        try:
+            df_routes = by_origin.loc[[origin_airport]].reset_index()
+        except KeyError:
+            df_routes = sample10_df.iloc[:0]
     else:
         df_routes = sample10_df
     
-    # creating the routes on the map
-    route_coords = pd.merge(
-        pd.merge(df_routes, airports_df, left_on='Origin', right_on='local_code', how='left'),
-        airports_df, left_on='Dest', right_on='local_code', how='left',
-        suffixes=('_origin', '_dest')
+    # one pass over the flights: sums and counts per route. The route map, the top routes and the
+    # destination metrics are all derived from this small table instead of grouping the flights again
+    route_sums = df_routes.groupby(['Origin', 'Dest'], observed=True).agg(
+        FlightNum=('FlightNum', 'count'),
+        ArrDelay_sum=('ArrDelay', 'sum'),
+        ArrDelay_count=('ArrDelay', 'count'),
+        AirTime_sum=('AirTime', 'sum'),
+        AirTime_count=('AirTime', 'count'),
+        Cancelled=('Cancelled', 'sum')
     )
-    
-    # creating actual routes
-    route_stats = route_coords.groupby(['Origin', 'Dest', 'latitude_deg_origin', 'longitude_deg_origin', 
-                                      'latitude_deg_dest', 'longitude_deg_dest']).agg({ 'FlightNum': 'count', 'ArrDelay': 'mean','AirTime': 'mean'}).reset_index()
-    
-    map_fig = go.Figure()
-    
+
+    # creating actual routes, the coordinates are looked up once per route
+    route_stats = route_sums.reset_index()
+    route_stats = route_stats.assign(
+        ArrDelay=route_stats['ArrDelay_sum'] / route_stats['ArrDelay_count'],
+        AirTime=route_stats['AirTime_sum'] / route_stats['AirTime_count'],
+        latitude_deg_origin=route_stats['Origin'].map(LAT).astype(float),
+        longitude_deg_origin=route_stats['Origin'].map(LON).astype(float),
+        latitude_deg_dest=route_stats['Dest'].map(LAT).astype(float),
+        longitude_deg_dest=route_stats['Dest'].map(LON).astype(float)
+    ).dropna(subset=['latitude_deg_origin', 'longitude_deg_origin', 'latitude_deg_dest', 'longitude_deg_dest'])
+
+    # only the 50 busiest routes are drawn, so the map stays fast no matter how many routes there are
+    route_stats = route_stats.nlargest(50, 'FlightNum')
+
+    # all routes go into one line trace: origin, destination and then a gap so the next route is a separate line
+    n = len(route_stats)
+    lons = np.full(3 * n, np.nan)
+    lats = np.full(3 * n, np.nan)
+    lons[0::3] = route_stats['longitude_deg_origin']
+    lons[1::3] = route_stats['longitude_deg_dest']
+    lats[0::3] = route_stats['latitude_deg_origin']
+    lats[1::3] = route_stats['latitude_deg_dest']
+
+    route_text = (route_stats['Origin'].astype(str) + ' → ' + route_stats['Dest'].astype(str)
+                  + '<br>Flights: ' + route_stats['FlightNum'].astype(str)).to_numpy()
+    texts = np.full(3 * n, '', dtype=object)
+    texts[0::3] = route_text
+    texts[1::3] = route_text
+
     # Add routes as lines
-    for _, route in route_stats.iterrows():
-        map_fig.add_trace(go.Scattergeo(
-            lon=[route['longitude_deg_origin'], route['longitude_deg_dest']],
-            lat=[route['latitude_deg_origin'], route['latitude_deg_dest']],
-            mode='lines',
-            line=dict(width=1, color='blue'),
-            opacity=0.6,
-            hoverinfo='text',
-            text=f"{route['Origin']} → {route['Dest']}<br>Flights: {route['FlightNum']}"
-        ))
+    map_fig = go.Figure(go.Scattergeo(
+        lon=lons,
+        lat=lats,
+        mode='lines',
+        line=dict(width=1, color='blue'),
+        opacity=0.6,
+        hoverinfo='text',
+        text=texts,
+        name='Routes'
+    ))
     
     # update the map with the routes
     map_fig.update_layout(
-        title='Route Network',
+        title='Route Network (50 busiest routes)',
         geo=dict(
             scope='usa',
             projection_type='albers usa',
@@ -371,22 +523,28 @@ def origin_airport_analysis(origin_airport, metric):
     )
     
     # sunburst charts to see what airlines fly what routes
-    top_routes = df_routes.groupby(['Origin', 'Dest']).size().reset_index(name='flights') 
-    top_routes = top_routes.nlargest(5, 'flights') # taking 5 most used routes
-    
- 
-    carrier_competition = df_routes.merge(top_routes[['Origin', 'Dest']], on=['Origin', 'Dest'])
+    top_routes = route_sums['FlightNum'].nlargest(5).index # taking 5 most used routes
+
+    # keeping only the flights on those routes
+    on_top_route = pd.MultiIndex.from_arrays([df_routes['Origin'], df_routes['Dest']]).isin(top_routes)
+    carrier_competition = df_routes.loc[on_top_route]
     
-    # creating sunburst
+    # total distance per carrier on each route, keeping only the 10 biggest carriers per route
+    carrier_competition = carrier_competition.groupby(['Origin', 'Dest', 'UniqueCarrier'], observed=True)['Distance'].sum()
+    carrier_competition = carrier_competition.sort_values(ascending=False).groupby(level=['Origin', 'Dest'], observed=True).head(10).reset_index()
+
+    # creating sunburst, the path columns are cast back to strings so unused categories don't show up
+    carrier_competition = carrier_competition.astype({'Origin': str, 'Dest': str, 'UniqueCarrier': str})
     competition_fig = px.sunburst( carrier_competition, path=['Origin', 'Dest', 'UniqueCarrier'], values='Distance', title='Biggest carrier per destination')
     
 
-    # amount of flights to destinations
-    performance_metrics = df_routes.groupby('Dest').agg({
-        'FlightNum': 'count',
-        'ArrDelay': 'mean',
-        'Cancelled': 'mean',  
-        'AirTime': 'mean'
+    # amount of flights to destinations, adding up the routes to each destination
+    dest_sums = route_sums.groupby(level='Dest', observed=True).sum()
+    performance_metrics = pd.DataFrame({
+        'FlightNum': dest_sums['FlightNum'],
+        'ArrDelay': dest_sums['ArrDelay_sum'] / dest_sums['ArrDelay_count'],
+        'Cancelled': dest_sums['Cancelled'] / dest_sums['FlightNum'],
+        'AirTime': dest_sums['AirTime_sum'] / dest_sums['AirTime_count']
     }).reset_index()
 
     # cancelled as a percentage rather than a fraction
@@ -418,17 +576,22 @@ def origin_airport_analysis(origin_airport, metric):
     )
     
     # flights for each time of the day
-    df_routes['Hour'] = (df_routes['DepTime'] / 100).astype(int)
+    # DepTime is hhmm, so integer division by 100 gives the hour. assign makes a new frame, so the sample itself isn't changed
+    hour = df_routes['DepTime'].to_numpy(dtype='float32', na_value=0).astype(np.int16) // 100
+    df_routes = df_routes.assign(Hour=hour)
     time_performance = df_routes.groupby('Hour').agg({
         'FlightNum': 'count',
         'ArrDelay': 'mean',
-        'Cancelled': lambda x: (x == 1).mean() * 100
+        'Cancelled': 'mean'
     }).reset_index()
+
+    # cancelled is 0 or 1, so its mean is the fraction cancelled, shown as a percentage
+    time_performance['Cancelled'] = time_performance['Cancelled'] * 100
     
     time_fig = go.Figure()
     
     # adding a trace through this time of day scatterplot to make a line chart
-    time_fig.add_trace(go.Scatter(
+    time_fig.add_trace(go.Scattergl(
         x=time_performance['Hour'],
         y=time_performance['FlightNum'],
         name='Flights',
@@ -457,11 +620,9 @@ def dynamic_dropdown(origin):
     if origin == None:
         return [], html.Div([])
     
-    destinationcodes = sample10_df[sample10_df['Origin'] == origin]['Dest'].unique()
-    destinations = airports_df[airports_df['iata_code'].isin(destinationcodes)]
-    n = destinations.shape[0]
-    message = html.Div([html.P(f"There are {n} possible destinations")])
-    return [{'label': row['iata_code']+": "+row['name'], 'value': row['iata_code']} for _,row in destinations.iterrows()], message
+    destinations = DEST_BY_ORIGIN.get(origin, [])
+    message = html.Div([html.P(f"There are {len(destinations)} possible destinations")])
+    return destinations, message
 
 
 @callback(
@@ -474,6 +635,7 @@ def dynamic_dropdown(origin):
      Input('TimeFrame', 'value')]
 )
 
+@cache.memoize()
 def flight_connection_analysis_update(Origin, Destination, timeframe):
     delayfigure = go.Figure()
 
@@ -484,24 +646,27 @@ def flight_connection_analysis_update(Origin, Destination, timeframe):
     if Origin == None or Destination == None:
         return delayfigure, go.Figure(), go.Figure(), go.Figure()
     
-    selected_data = sample10_df[(sample10_df["Origin"] == Origin) & (sample10_df["Dest"] == Destination)]
+    try:
+        selected_data = by_od.loc[[(Origin, Destination)]]
+    except KeyError:
+        return delayfigure, go.Figure(), go.Figure(), go.Figure()
     if selected_data.empty:
         return delayfigure, go.Figure(), go.Figure(), go.Figure()
-    copy = selected_data
 
     # BAR PLOT
 
+    # month and day numbers start at 1, so number - 1 is directly the position of the name in the list.
+    # grouping on these ordered categories gives every month/day in order, also the ones without flights
     if timeframe == 'Month':
-        selected_data['Month'] = selected_data['Month'].map(lambda x: months[x - 1])
-        avg_delay = selected_data.groupby('Month')['ArrDelay'].mean().reindex(months)
+        labels = pd.Categorical.from_codes(selected_data['Month'].to_numpy() - 1, categories=months, ordered=True)
         xax = months
     elif timeframe == 'Day':
-        selected_data['DayOfWeek'] = selected_data['DayOfWeek'].map(lambda x: weekdays[x - 1])
-        avg_delay = selected_data.groupby('DayOfWeek')['ArrDelay'].mean().reindex(weekdays)
+        labels = pd.Categorical.from_codes(selected_data['DayOfWeek'].to_numpy() - 1, categories=weekdays, ordered=True)
         xax = weekdays
-        
+    avg_delay = selected_data['ArrDelay'].groupby(labels, observed=False).mean()
+
     delayfigure.add_trace(go.Bar(
-        x=avg_delay.index,
+        x=xax,
         y=avg_delay.values,
         marker_color='Blue',
     ))
@@ -527,7 +692,9 @@ def flight_connection_analysis_update(Origin, Destination, timeframe):
     )
 
     # PIE CHART 2
-    carriercontribution = selected_data.groupby('UniqueCarrier').size()### DIT IS NOG FOUT
+    carriercontribution = selected_data['UniqueCarrier'].value_counts()### DIT IS NOG FOUT
+    # value_counts on a category also counts the carriers that don't fly this route, leave those out
+    carriercontribution = carriercontribution[carriercontribution > 0]
     carriercomparison = go.Figure(
         data=[go.Pie(
             labels=carriercontribution.index,
@@ -539,19 +706,17 @@ def flight_connection_analysis_update(Origin, Destination, timeframe):
     )
 
     # PIE CHART 3
-    def handledelaytype(row):
-        if row['Cancelled'] == 1:
-            return 'Cancelled'
-        elif row['Diverted'] == 1:
-            return 'Diverted'
-        elif row ['ArrDelay'] > 60:
-            return 'Severe Delay (>60 min)'
-        elif row ['ArrDelay'] > 15:
-            return 'Considerable Delay (>15 min, <60 min)'
-        else: return 'Negligable Delay (<15 min)'
-
-    copy['delaytype'] = copy.apply(handledelaytype, axis=1)
-    delaycounts = copy['delaytype'].value_counts()
+    # every flight gets the delay type of the first condition it matches, done on the whole columns at once
+    conditions = [
+        selected_data['Cancelled'] == 1,
+        selected_data['Diverted'] == 1,
+        selected_data['ArrDelay'] > 60,
+        selected_data['ArrDelay'] > 15
+    ]
+    delaytypes = ['Cancelled', 'Diverted', 'Severe Delay (>60 min)', 'Considerable Delay (>15 min, <60 min)']
+
+    delaytype = pd.Series(np.select(conditions, delaytypes, default='Negligable Delay (<15 min)'))
+    delaycounts = delaytype.value_counts()
 
     delaydistribution = go.Figure(
         data=[go.Pie(
@@ -571,6 +736,9 @@ def flight_connection_analysis_update(Origin, Destination, timeframe):
 
 
 # run it all
+# debug mode (with the reloader that loads all data again on every save) is off unless DASH_DEBUG=true is set,
+# dash reads that variable itself. for real use, run it with several workers instead, each worker loads the data once:
+#   gunicorn -w 4 dashtut:server
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    app.run_server()
 